@@ -1,8 +1,16 @@
+import hashlib
+import io
+import unicodedata
+import zipfile
+
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pandas.api.indexers import BaseIndexer
 
 # Aircraft capacity dictionary
 AIRCRAFT_CAPACITY = {
@@ -24,6 +32,9 @@ AIRCRAFT_CAPACITY = {
     'A21N': 224
 }
 
+# Service types without regular revenue traffic (Ferry, Manutenção, etc.)
+NON_REVENUE_SERVICE_TYPES = ['F', 'M', 'P', 'A', 'X', 'Y', 'Z']
+
 def format_date(date_val):
     """Helper function to safely format dates"""
     try:
@@ -35,9 +46,10 @@ def format_date(date_val):
     except:
         return str(date_val)
 
-def generate_validation_report(df):
+def generate_validation_report(df, missing_slots=None):
     """
     Generate a text report summarizing all validations.
+    missing_slots are the planned slots without a matching RIMA movement.
     """
     report = []
     
@@ -103,9 +115,55 @@ def generate_validation_report(df):
             )
     report.append("")
 
+    # 5. Anomalias Estatísticas
+    if 'ANOMALIA_ESTATISTICA' in df.columns:
+        report.append("5. ANOMALIAS ESTATÍSTICAS")
+        report.append("-" * 20)
+        anomalies = df[df['ANOMALIA_ESTATISTICA']].copy()
+        report.append(f"Total de anomalias: {len(anomalies)}")
+        if not anomalies.empty:
+            report.append("\nDetalhamento das anomalias estatísticas:")
+            for _, row in anomalies.iterrows():
+                report.append(
+                    f"Voo: {row['VOO_NUMERO']} - "
+                    f"Data: {format_date(row['CALCO_DATA'])} - "
+                    f"Operador: {row['AERONAVE_OPERADOR']} - "
+                    f"Score: {row['ANOMALIA_SCORE']:.1f} - "
+                    f"{row['ANOMALIA_DETALHE']}"
+                )
+        report.append("")
+
+    # 6. Reconciliação com a Programação
+    if 'RECONCILIACAO_STATUS' in df.columns:
+        report.append("6. RECONCILIAÇÃO COM A PROGRAMAÇÃO")
+        report.append("-" * 20)
+        status_counts = df.loc[df['RECONCILIACAO_STATUS'] != '', 'RECONCILIACAO_STATUS'].value_counts()
+        for status, count in status_counts.items():
+            report.append(f"{status}: {count}")
+        divergent = df[df['RECONCILIACAO_DIVERGENTE']].copy()
+        if not divergent.empty:
+            report.append("\nDetalhamento dos movimentos divergentes:")
+            for _, row in divergent.iterrows():
+                report.append(
+                    f"Voo: {row['VOO_NUMERO']} - "
+                    f"Data: {row['CALCO_DATA'].strftime('%d/%m/%Y')} - "
+                    f"Operador: {row['AERONAVE_OPERADOR']} - "
+                    f"Aeronave: {row['AERONAVE_TIPO']} - "
+                    f"Situação: {row['RECONCILIACAO_STATUS']}"
+                )
+        if missing_slots is not None:
+            report.append(f"\nProgramados não realizados: {len(missing_slots)}")
+            for _, row in missing_slots.iterrows():
+                report.append(
+                    f"Voo: {row['VOO_NUMERO']} - "
+                    f"Programado: {row['PROGRAMADO_DATETIME'].strftime('%d/%m/%Y %H:%M')} - "
+                    f"Operador: {row['AERONAVE_OPERADOR']} - "
+                    f"Movimento: {row['MOVIMENTO_TIPO']}"
+                )
+        report.append("")
 
-    # 6. Estatísticas Finais
-    report.append("6. ESTATÍSTICAS FINAIS")
+    # 7. Estatísticas Finais
+    report.append("7. ESTATÍSTICAS FINAIS")
     report.append("-" * 20)
     report.append(f"Percentual de voos com alguma violação: {(len(df[df['EXCEEDS_CAPACITY'] | df['GERAL_PAX_VIOLATION'] | df['RPE_BRANCO_VIOLATION'] | df['HORARIO_INVALIDO']]) / len(df) * 100):.1f}%")
     
@@ -113,6 +171,145 @@ def generate_validation_report(df):
     return "\n".join(report)
 
 
+# Sheet name -> boolean column flagging the rows of each violation category
+VIOLATION_CATEGORIES = {
+    'Capacidade': 'EXCEEDS_CAPACITY',
+    'GERAL PAX': 'GERAL_PAX_VIOLATION',
+    'RPE em Branco': 'RPE_BRANCO_VIOLATION',
+    'Horário Inválido': 'HORARIO_INVALIDO',
+    'Anomalia Estatística': 'ANOMALIA_ESTATISTICA',
+    'Reconciliação': 'RECONCILIACAO_DIVERGENTE',
+}
+
+EXPORT_FORMATS = ('xlsx', 'csv', 'parquet')
+EXPORT_CHUNK_SIZE = 50_000
+EXCEL_MAX_ROWS = 1_048_576
+
+
+def iter_export_chunks(df, flag_column=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield consecutive slices of the dataframe, optionally keeping only the
+    rows where flag_column is True. Only one chunk is materialized at a time.
+    """
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        if flag_column is not None:
+            chunk = chunk[chunk[flag_column].fillna(False).astype(bool)]
+        if not chunk.empty:
+            yield chunk
+
+
+def _export_sheets(df):
+    """List the (name, flag column) pairs exported: the full frame plus one per rule."""
+    sheets = [('Dados Validados', None)]
+    sheets += [
+        (name, column) for name, column in VIOLATION_CATEGORIES.items()
+        if column in df.columns
+    ]
+    return sheets
+
+
+def _write_xlsx(df, output, chunk_size):
+    """Write one sheet per category using xlsxwriter's constant-memory mode."""
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(output, {
+        'constant_memory': True,
+        'default_date_format': 'dd/mm/yyyy hh:mm',
+        'in_memory': False,
+        # Text is written as text, never as formulas or hyperlinks
+        'strings_to_formulas': False,
+        'strings_to_urls': False,
+    })
+    header_format = workbook.add_format({'bold': True})
+    columns = list(df.columns)
+
+    def new_sheet(name, part):
+        title = name if part == 1 else f"{name} ({part})"
+        worksheet = workbook.add_worksheet(title[:31])
+        worksheet.write_row(0, 0, columns, header_format)
+        return worksheet
+
+    for name, flag_column in _export_sheets(df):
+        part = 1
+        worksheet = new_sheet(name, part)
+        row_idx = 1
+        for chunk in iter_export_chunks(df, flag_column, chunk_size):
+            # Missing values become blank cells instead of NaN/NaT
+            chunk = chunk.astype(object).where(chunk.notna(), None)
+            for values in chunk.itertuples(index=False, name=None):
+                # Rows beyond Excel's limit continue on a new sheet
+                if row_idx == EXCEL_MAX_ROWS:
+                    part += 1
+                    worksheet = new_sheet(name, part)
+                    row_idx = 1
+                worksheet.write_row(row_idx, 0, values)
+                row_idx += 1
+
+    workbook.close()
+
+
+def _write_csv(df, output, flag_column, chunk_size):
+    """Append the rows of one category to a CSV text stream, chunk by chunk."""
+    df.iloc[:0].to_csv(output, sep=';', index=False)
+    for chunk in iter_export_chunks(df, flag_column, chunk_size):
+        chunk.to_csv(output, sep=';', index=False, header=False)
+
+
+def _write_parquet(df, output, flag_column, chunk_size):
+    """Write the rows of one category as successive Parquet row groups."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Infer the schema from the first rows; all-null object columns fall back to text
+    schema = pa.Schema.from_pandas(df.head(chunk_size), preserve_index=False)
+    for i, field in enumerate(schema):
+        if pa.types.is_null(field.type):
+            schema = schema.set(i, field.with_type(pa.string()))
+
+    with pq.ParquetWriter(output, schema) as writer:
+        for chunk in iter_export_chunks(df, flag_column, chunk_size):
+            writer.write_table(
+                pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            )
+
+
+def export_validation_data(df, output, fmt='xlsx', chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Export the validated dataframe and each violation category.
+
+    - 'xlsx': a single workbook with one sheet per category
+    - 'csv' / 'parquet': a ZIP archive with one file per category
+
+    output may be a file path or a binary file-like object. Rows are written
+    in chunks so memory use does not grow with the number of violations.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportação inválido: {fmt}")
+
+    # Datetime columns parsed row by row arrive as object dtype
+    df = df.copy(deep=False)
+    for column in ('CALCO_DATETIME', 'TOQUE_DATETIME'):
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column])
+
+    if fmt == 'xlsx':
+        _write_xlsx(df, output, chunk_size)
+        return output
+
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, flag_column in _export_sheets(df):
+            file_name = f"{name.lower().replace(' ', '_')}.{fmt}"
+            with archive.open(file_name, 'w', force_zip64=True) as entry:
+                if fmt == 'csv':
+                    with io.TextIOWrapper(entry, encoding='utf-8', newline='') as text:
+                        _write_csv(df, text, flag_column, chunk_size)
+                else:
+                    _write_parquet(df, entry, flag_column, chunk_size)
+
+    return output
+
+
 def validate_passenger_count(df):
     """Validate passenger counts and add necessary columns for analysis."""
     # Add capacity column based on aircraft type
@@ -173,7 +370,7 @@ def validate_passenger_count(df):
     df['RPE_BRANCO_VIOLATION'] = (
         (df['AERONAVE_OPERADOR'] != 'GERAL') & 
         (df['TOTAL_PAX'] == 0) & 
-        (~df['SERVICE_TYPE'].isin(['F','M','P','A','X','Y','Z']))
+        (~df['SERVICE_TYPE'].isin(NON_REVENUE_SERVICE_TYPES))
     )
 
     # Create operation type column
@@ -348,6 +545,154 @@ def validate_movement_times(df):
 
     return df
 
+
+# Metrics monitored by the statistical anomaly detection
+ANOMALY_METRICS = ['TOTAL_PAX', 'OCCUPANCY_RATE', 'CARGA', 'CORREIO']
+
+# Route columns used for the operator/route baseline, when present in the file
+ROUTE_COLUMNS = ['AEROPORTO_ORIGEM', 'AEROPORTO_DESTINO']
+
+ANOMALY_WINDOW = 30          # previous movements in the rolling baseline
+ANOMALY_MIN_PERIODS = 8      # minimum values in the median and in the spread windows;
+                             # a movement is scored only after 2 * ANOMALY_MIN_PERIODS
+                             # previous movements of its group
+ANOMALY_THRESHOLD = 3.5      # modified z-score limit
+ANOMALY_MIN_MAD_RATIO = 0.05 # spread floor as a fraction of the median
+
+# Absolute spread floor per metric, so a history of constant values (e.g. flights
+# that never carry mail) still flags a large deviation instead of dividing by zero
+ANOMALY_MIN_MAD = {
+    'TOTAL_PAX': 2.0,        # passengers
+    'OCCUPANCY_RATE': 2.0,   # percentage points
+    'CARGA': 20.0,           # kg
+    'CORREIO': 20.0,         # kg
+}
+
+def has_route_columns(df):
+    """Whether the file carries the origin and destination needed for the route level"""
+    return all(col in df.columns for col in ROUTE_COLUMNS)
+
+
+class _GroupedWindowIndexer(BaseIndexer):
+    """
+    Trailing window of at most window_size rows that never crosses the start
+    of its group, so a single rolling pass over group-sorted data computes
+    every group's window at once.
+    """
+
+    def get_window_bounds(self, num_values=0, min_periods=None, center=None, closed=None, step=None):
+        end = np.arange(1, num_values + 1, dtype=np.int64)
+        start = np.maximum(end - self.window_size, self.group_start).astype(np.int64)
+        return start, end
+
+
+def _shift_within_groups(values, group_first):
+    """Previous value inside the same group (NaN at the first row of each group)."""
+    previous = np.empty_like(values)
+    previous[0:1] = np.nan
+    previous[1:] = values[:-1]
+    previous[group_first] = np.nan
+    return previous
+
+
+def detect_statistical_anomalies(df, window=ANOMALY_WINDOW, min_periods=ANOMALY_MIN_PERIODS,
+                                 threshold=ANOMALY_THRESHOLD):
+    """
+    Flag commercial movements whose PAX, occupancy, cargo or mail deviate from
+    the history of the same flight number and movement type or of the same
+    operator, route and movement type.
+
+    The baseline of each movement is the rolling median of the previous
+    movements of its group. The spread approximates the MAD with a streaming
+    estimate: the rolling median of the absolute deviations of the previous
+    movements, each measured against its own baseline (not against the
+    current window's median). A movement is an outlier when its modified
+    z-score (0.6745 * deviation / spread) exceeds the threshold.
+
+    Both windows need min_periods values, so the first movement that can be
+    scored is the one after 2 * min_periods movements of its group. The
+    spread never goes below ANOMALY_MIN_MAD or ANOMALY_MIN_MAD_RATIO times
+    the baseline.
+    """
+    df = df.copy()
+
+    # Grouping levels: flight number and, when available, operator and route
+    levels = [('voo', ['AERONAVE_OPERADOR', 'VOO_NUMERO', 'MOVIMENTO_TIPO'])]
+    if has_route_columns(df):
+        levels.append(('rota', ['AERONAVE_OPERADOR'] + ROUTE_COLUMNS + ['MOVIMENTO_TIPO']))
+
+    # Commercial revenue flights, in chronological order
+    if 'CALCO_DATETIME' in df.columns:
+        timestamps = pd.to_datetime(df['CALCO_DATETIME'])
+    else:
+        timestamps = pd.to_datetime(df['CALCO_DATA'], dayfirst=True, errors='coerce')
+    eligible = (
+        (df['AERONAVE_OPERADOR'] != 'GERAL') &
+        (~df['SERVICE_TYPE'].isin(NON_REVENUE_SERVICE_TYPES)) &
+        timestamps.notna()
+    )
+    order = timestamps[eligible].sort_values(kind='stable').index
+    data = df.loc[order].reset_index(drop=True)
+    n = len(data)
+
+    flagged = np.zeros(n, dtype=bool)
+    max_score = np.zeros(n)
+    details = pd.Series('', index=data.index)
+
+    for level_name, keys in levels:
+        # Stable sort by group keeps each group in chronological order
+        codes = data.groupby(keys, sort=False, dropna=True).ngroup().to_numpy()
+        positions = np.argsort(codes, kind='stable')
+        sorted_codes = codes[positions]
+        group_first = np.r_[True, sorted_codes[1:] != sorted_codes[:-1]][:n]
+        group_start = np.maximum.accumulate(np.where(group_first, np.arange(n), 0))
+        indexer = _GroupedWindowIndexer(window_size=window, group_start=group_start)
+
+        for metric in ANOMALY_METRICS:
+            values = pd.to_numeric(data[metric], errors='coerce').to_numpy(dtype=float)[positions]
+            values[sorted_codes < 0] = np.nan
+
+            # Baseline from previous movements only, so the outlier does not mask itself
+            previous = _shift_within_groups(values, group_first)
+            baseline = pd.Series(previous).rolling(indexer, min_periods=min_periods).median().to_numpy()
+
+            deviation = np.abs(values - baseline)
+            previous_dev = _shift_within_groups(deviation, group_first)
+            mad = pd.Series(previous_dev).rolling(indexer, min_periods=min_periods).median().to_numpy()
+            mad = np.maximum(mad, np.abs(baseline) * ANOMALY_MIN_MAD_RATIO)
+            mad = np.maximum(mad, ANOMALY_MIN_MAD[metric])
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                score = np.abs(0.6745 * (values - baseline) / mad)
+            score = np.where(np.isfinite(score), score, 0.0)
+
+            # Back to chronological order
+            score_chrono = np.empty(n)
+            score_chrono[positions] = score
+            baseline_chrono = np.empty(n)
+            baseline_chrono[positions] = baseline
+            outlier = score_chrono > threshold
+
+            flagged |= outlier
+            np.maximum(max_score, score_chrono, out=max_score)
+            if outlier.any():
+                previous_details = details[outlier]
+                details[outlier] = (
+                    previous_details + np.where(previous_details != '', '; ', '') +
+                    f"{metric} ({level_name}): " +
+                    data.loc[outlier, metric].round(1).astype(str) +
+                    " vs mediana " + pd.Series(baseline_chrono[outlier], index=previous_details.index).round(1).astype(str)
+                )
+
+    df['ANOMALIA_ESTATISTICA'] = False
+    df['ANOMALIA_SCORE'] = 0.0
+    df['ANOMALIA_DETALHE'] = ''
+    df.loc[order, 'ANOMALIA_ESTATISTICA'] = flagged
+    df.loc[order, 'ANOMALIA_SCORE'] = max_score.round(2)
+    df.loc[order, 'ANOMALIA_DETALHE'] = details.to_numpy()
+
+    return df
+
 def create_cargo_chart(df):
     """Create the daily cargo chart."""
     # Agrupa por data e soma carga e correio
@@ -486,36 +831,517 @@ def create_geral_validation_chart(df):
     return fig, geral_flights[geral_flights['TOTAL_PAX'] > 0]
 
 
+# Datetime column used for each peak analysis
+PEAK_SOURCES = {
+    'Pista (Toque)': 'TOQUE_DATETIME',
+    'Pátio (Calço)': 'CALCO_DATETIME',
+}
+
+PEAK_WINDOW = pd.Timedelta(minutes=60)
+
+MOVEMENT_LABELS = {'P': 'Pouso', 'D': 'Decolagem'}
+
+
+def _rolling_window_counts(times, segments, window=PEAK_WINDOW):
+    """
+    Count, for every movement, how many movements of the same segment fall in
+    [time, time + window). A single sort on (segment, time) followed by a
+    vectorized two-pointer search (searchsorted) gives O(n log n) overall.
+    """
+    codes = pd.factorize(segments)[0].astype(np.int64)
+    t = times.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    window_ns = int(window.value)
+
+    # Segments are spaced further apart than the window, so no window crosses them
+    t = t - t.min()
+    key = codes * (t.max() + window_ns + 1) + t
+
+    order = np.argsort(key, kind='stable')
+    sorted_key = key[order]
+    window_end = np.searchsorted(sorted_key, sorted_key + window_ns, side='left')
+
+    counts = np.empty(len(key), dtype=np.int64)
+    counts[order] = window_end - np.arange(len(key))
+    return counts
+
+
+def compute_peak_hours(df, time_column):
+    """
+    Compute peak-hour statistics from a parsed datetime column.
+
+    Returns:
+    - hourly_movements: movements per clock hour, by movement and operation type
+    - rolling_peaks: busiest rolling 60-minute window per segment
+    - daily_peaks: busiest clock hour and rolling window of each day
+    """
+    movements = df[[time_column, 'MOVIMENTO_TIPO', 'OPERATION_TYPE']].copy()
+    movements['HORARIO'] = pd.to_datetime(movements[time_column])
+    movements = movements.dropna(subset=['HORARIO'])
+    movements['HORA'] = movements['HORARIO'].dt.floor('h')
+    movements['MOVIMENTO'] = movements['MOVIMENTO_TIPO'].map(MOVEMENT_LABELS).fillna(movements['MOVIMENTO_TIPO'])
+
+    # Movements per clock hour
+    hourly_movements = movements.groupby(
+        ['HORA', 'MOVIMENTO', 'OPERATION_TYPE']
+    ).size().reset_index(name='MOVIMENTOS')
+
+    # Rolling 60-minute counts for the total and each P/D and operation type segment
+    segmented = pd.concat([
+        movements[['HORARIO']].assign(SEGMENTO='Total'),
+        movements[['HORARIO']].assign(SEGMENTO=movements['MOVIMENTO']),
+        movements[['HORARIO']].assign(SEGMENTO=movements['OPERATION_TYPE']),
+    ], ignore_index=True)
+    if segmented.empty:
+        segmented['MOVIMENTOS_60MIN'] = pd.Series(dtype='int64')
+    else:
+        segmented['MOVIMENTOS_60MIN'] = _rolling_window_counts(segmented['HORARIO'], segmented['SEGMENTO'])
+
+    rolling_peaks = segmented.loc[
+        segmented.groupby('SEGMENTO')['MOVIMENTOS_60MIN'].idxmax()
+    ].rename(columns={'HORARIO': 'INICIO_JANELA'})
+    rolling_peaks = rolling_peaks[['SEGMENTO', 'INICIO_JANELA', 'MOVIMENTOS_60MIN']]
+    rolling_peaks = rolling_peaks.sort_values('MOVIMENTOS_60MIN', ascending=False)
+
+    # Busiest clock hour and rolling window of each day (all movements)
+    hourly_total = movements.groupby('HORA').size().reset_index(name='MOVIMENTOS_HORA')
+    hourly_total['DATA'] = hourly_total['HORA'].dt.normalize()
+    daily_clock = hourly_total.loc[hourly_total.groupby('DATA')['MOVIMENTOS_HORA'].idxmax()]
+
+    total = segmented[segmented['SEGMENTO'] == 'Total'].copy()
+    total['DATA'] = total['HORARIO'].dt.normalize()
+    daily_rolling = total.loc[total.groupby('DATA')['MOVIMENTOS_60MIN'].idxmax()]
+    daily_rolling = daily_rolling.rename(columns={'HORARIO': 'INICIO_JANELA'})
+
+    daily_peaks = daily_clock[['DATA', 'HORA', 'MOVIMENTOS_HORA']].merge(
+        daily_rolling[['DATA', 'INICIO_JANELA', 'MOVIMENTOS_60MIN']], on='DATA', how='outer'
+    ).sort_values('DATA')
+
+    return hourly_movements, rolling_peaks, daily_peaks
+
+
+def create_peak_hour_chart(hourly_movements):
+    """Create the chart of peak movements per hour of the day."""
+    by_hour = hourly_movements.groupby(['HORA', 'MOVIMENTO'])['MOVIMENTOS'].sum().reset_index()
+    by_hour['HORA_DO_DIA'] = by_hour['HORA'].dt.hour
+    peak_by_hour = by_hour.groupby(['HORA_DO_DIA', 'MOVIMENTO'])['MOVIMENTOS'].max().reset_index()
+
+    fig = px.bar(
+        peak_by_hour,
+        x='HORA_DO_DIA',
+        y='MOVIMENTOS',
+        color='MOVIMENTO',
+        title='Pico de Movimentos por Hora do Dia',
+        template="plotly_white",
+        barmode='group',
+        text='MOVIMENTOS',
+        color_discrete_map={
+            'Pouso': '#2E86C1',
+            'Decolagem': '#E67E22'
+        }
+    )
+
+    fig.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='#2C3E50'),
+        title_font_color='#2C3E50',
+        legend_title_text='Movimento',
+        xaxis_title="Hora do Dia",
+        yaxis_title="Máximo de Movimentos na Hora",
+        xaxis=dict(dtick=1)
+    )
+
+    fig.update_traces(
+        textposition='outside',
+        texttemplate='%{text:,.0f}'
+    )
+
+    return fig
+
+
+def create_daily_peak_chart(daily_peaks):
+    """Create the chart of the busiest hour of each day."""
+    daily_melted = pd.melt(
+        daily_peaks,
+        id_vars=['DATA'],
+        value_vars=['MOVIMENTOS_HORA', 'MOVIMENTOS_60MIN'],
+        var_name='Tipo',
+        value_name='Movimentos'
+    )
+    daily_melted['Tipo'] = daily_melted['Tipo'].map({
+        'MOVIMENTOS_HORA': 'Hora-Relógio',
+        'MOVIMENTOS_60MIN': 'Janela Móvel 60 min'
+    })
+
+    fig = px.line(
+        daily_melted,
+        x='DATA',
+        y='Movimentos',
+        color='Tipo',
+        title='Hora-Pico por Dia',
+        template="plotly_white",
+        markers=True,
+        color_discrete_map={
+            'Hora-Relógio': '#27AE60',
+            'Janela Móvel 60 min': '#8E44AD'
+        }
+    )
+
+    fig.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='#2C3E50'),
+        title_font_color='#2C3E50',
+        xaxis_title="Data",
+        yaxis_title="Movimentos na Hora-Pico"
+    )
+
+    return fig
+
+
+# Header variants found in HOTRAN/SIROS exports -> canonical schedule columns
+SCHEDULE_COLUMN_ALIASES = {
+    'AERONAVE_OPERADOR': 'AERONAVE_OPERADOR',
+    'EMPRESA': 'AERONAVE_OPERADOR',
+    'OPERADOR': 'AERONAVE_OPERADOR',
+    'CIA': 'AERONAVE_OPERADOR',
+    'SIGLA_EMPRESA': 'AERONAVE_OPERADOR',
+    'VOO_NUMERO': 'VOO_NUMERO',
+    'VOO': 'VOO_NUMERO',
+    'NUMERO_VOO': 'VOO_NUMERO',
+    'NR_VOO': 'VOO_NUMERO',
+    'NO_VOO': 'VOO_NUMERO',
+    'MOVIMENTO_TIPO': 'MOVIMENTO_TIPO',
+    'TIPO_MOVIMENTO': 'MOVIMENTO_TIPO',
+    'MOVIMENTO': 'MOVIMENTO_TIPO',
+    'AERONAVE_TIPO': 'AERONAVE_TIPO',
+    'EQUIPAMENTO': 'AERONAVE_TIPO',
+    'TIPO_AERONAVE': 'AERONAVE_TIPO',
+    'DATA': 'DATA_PROGRAMADA',
+    'DATA_VOO': 'DATA_PROGRAMADA',
+    'DATA_PROGRAMADA': 'DATA_PROGRAMADA',
+    'HORARIO': 'HORARIO_PROGRAMADO',
+    'HORA': 'HORARIO_PROGRAMADO',
+    'HORARIO_PROGRAMADO': 'HORARIO_PROGRAMADO',
+}
+
+SCHEDULE_REQUIRED_COLUMNS = [
+    'AERONAVE_OPERADOR', 'VOO_NUMERO', 'MOVIMENTO_TIPO', 'DATA_PROGRAMADA', 'HORARIO_PROGRAMADO'
+]
+
+SCHEDULE_TIME_TOLERANCE = pd.Timedelta(minutes=60)
+
+# Reconciliation statuses of the RIMA movements
+RECONCILIATION_MATCHED = 'Programado'
+RECONCILIATION_UNSCHEDULED = 'Não programado'
+RECONCILIATION_WRONG_OPERATOR = 'Operador divergente'
+RECONCILIATION_WRONG_AIRCRAFT = 'Equipamento divergente'
+
+
+def _normalize_header(name):
+    """Upper-case, accent-free, underscore-separated column name."""
+    name = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode('ascii')
+    return '_'.join(name.upper().replace('.', ' ').split())
+
+
+def _normalize_flight_number(values):
+    """Flight numbers as text without decimals or leading zeros ('0123', 123.0 -> '123')."""
+    numeric = pd.to_numeric(values, errors='coerce')
+    integral = numeric.notna() & (numeric == numeric.round())
+    text = values.astype(str).str.strip().str.upper()
+    return text.mask(integral, numeric.where(integral).astype('Int64').astype(str))
+
+
+def load_schedule(file):
+    """
+    Load a planned-schedule CSV (HOTRAN/SIROS-style, ';'-separated) and
+    return it with canonical column names and a PROGRAMADO_DATETIME column.
+    """
+    schedule = pd.read_csv(file, sep=';', encoding='utf-8', dtype=str)
+    schedule.columns = [_normalize_header(col) for col in schedule.columns]
+    schedule = schedule.rename(columns={
+        col: SCHEDULE_COLUMN_ALIASES[col] for col in schedule.columns if col in SCHEDULE_COLUMN_ALIASES
+    })
+    schedule = schedule.loc[:, ~schedule.columns.duplicated()]
+
+    missing = [col for col in SCHEDULE_REQUIRED_COLUMNS if col not in schedule.columns]
+    if missing:
+        raise ValueError(f"Colunas ausentes no arquivo de programação: {', '.join(missing)}")
+
+    # Parse date and time in one vectorized pass, falling back to dayfirst parsing
+    date_time = schedule['DATA_PROGRAMADA'].str.strip() + ' ' + schedule['HORARIO_PROGRAMADO'].str.strip()
+    parsed = pd.to_datetime(date_time, format='%d/%m/%Y %H:%M', errors='coerce')
+    unparsed = parsed.isna() & date_time.notna()
+    if unparsed.any():
+        parsed[unparsed] = pd.to_datetime(date_time[unparsed], dayfirst=True, errors='coerce', format='mixed')
+    schedule['PROGRAMADO_DATETIME'] = parsed.astype('datetime64[ns]')
+
+    schedule['AERONAVE_OPERADOR'] = schedule['AERONAVE_OPERADOR'].str.strip().str.upper()
+    schedule['MOVIMENTO_TIPO'] = schedule['MOVIMENTO_TIPO'].str.strip().str.upper()
+    if 'AERONAVE_TIPO' in schedule.columns:
+        schedule['AERONAVE_TIPO'] = schedule['AERONAVE_TIPO'].str.strip().str.upper()
+
+    return schedule
+
+
+def _match_nearest_slots(movements, slots, keys, tolerance):
+    """
+    One-to-one nearest-time join of movements to the planned slots sharing
+    the keys. Each round is a single merge_asof; a slot claimed by several
+    movements keeps the closest one and the others retry on the free slots.
+    Returns one row per matched movement, indexed by the movement index.
+    """
+    matches = []
+    pending = movements.rename_axis('RIMA_INDEX').reset_index()
+    available = slots
+    while not pending.empty and not available.empty:
+        candidates = pd.merge_asof(
+            pending, available,
+            on='HORARIO', by=keys,
+            direction='nearest', tolerance=tolerance, suffixes=('', '_PROGRAMADO')
+        )
+        candidates = candidates[candidates['SLOT_ID'].notna()].copy()
+        if candidates.empty:
+            break
+        candidates['DISTANCIA'] = (candidates['HORARIO'] - candidates['PROGRAMADO_DATETIME']).abs()
+        winners = candidates.sort_values(['SLOT_ID', 'DISTANCIA'], kind='stable').drop_duplicates('SLOT_ID')
+        matches.append(winners)
+        pending = pending[~pending['RIMA_INDEX'].isin(winners['RIMA_INDEX'])]
+        available = available[~available['SLOT_ID'].isin(winners['SLOT_ID'])]
+
+    if not matches:
+        return pd.DataFrame(
+            columns=['SLOT_ID', 'PROGRAMADO_DATETIME', 'AERONAVE_TIPO', 'AERONAVE_TIPO_PROGRAMADO'],
+            index=pd.Index([], name='RIMA_INDEX')
+        )
+    return pd.concat(matches).set_index('RIMA_INDEX')
+
+
+def reconcile_with_schedule(df, schedule, tolerance=SCHEDULE_TIME_TOLERANCE):
+    """
+    Reconcile commercial RIMA movements against the planned schedule.
+
+    Movements are joined one-to-one to the nearest planned slot of the same
+    operator, flight number and movement type within the time tolerance
+    (merge_asof, which hashes the 'by' keys and walks both sorted frames
+    once). A duplicated record or a repeated operation cannot share a slot:
+    only the closest movement keeps it. Unmatched movements are checked
+    again, against the slots still free, without the operator to detect
+    flights operated by another company.
+
+    Returns the dataframe with RECONCILIACAO_STATUS, HORARIO_PROGRAMADO and
+    RECONCILIACAO_DIVERGENTE columns, and the planned slots in the RIMA date
+    range that have no matching movement.
+    """
+    df = df.copy()
+    df['RECONCILIACAO_STATUS'] = ''
+    df['HORARIO_PROGRAMADO'] = pd.NaT
+    df['RECONCILIACAO_DIVERGENTE'] = False
+
+    # Both merge keys in the same resolution, whatever the parsed unit
+    calco = pd.to_datetime(df['CALCO_DATETIME']).astype('datetime64[ns]')
+    eligible = (
+        (df['AERONAVE_OPERADOR'] != 'GERAL') &
+        (~df['SERVICE_TYPE'].isin(NON_REVENUE_SERVICE_TYPES)) &
+        calco.notna()
+    )
+
+    movements = pd.DataFrame({
+        'AERONAVE_OPERADOR': df.loc[eligible, 'AERONAVE_OPERADOR'].astype(str).str.strip().str.upper(),
+        'VOO_NUMERO': _normalize_flight_number(df.loc[eligible, 'VOO_NUMERO']),
+        'MOVIMENTO_TIPO': df.loc[eligible, 'MOVIMENTO_TIPO'].astype(str).str.strip().str.upper(),
+        'AERONAVE_TIPO': df.loc[eligible, 'AERONAVE_TIPO'].astype(str).str.strip().str.upper(),
+        'HORARIO': calco[eligible],
+    }).sort_values('HORARIO', kind='stable')
+
+    slots = schedule.dropna(subset=['PROGRAMADO_DATETIME']).copy()
+    slots['SLOT_ID'] = np.arange(len(slots))
+    slots['VOO_NUMERO'] = _normalize_flight_number(slots['VOO_NUMERO'])
+    slots['PROGRAMADO_DATETIME'] = slots['PROGRAMADO_DATETIME'].astype('datetime64[ns]')
+    slots['HORARIO'] = slots['PROGRAMADO_DATETIME']
+    if 'AERONAVE_TIPO' not in slots.columns:
+        slots['AERONAVE_TIPO'] = np.nan
+    slots = slots[[
+        'SLOT_ID', 'AERONAVE_OPERADOR', 'VOO_NUMERO', 'MOVIMENTO_TIPO',
+        'AERONAVE_TIPO', 'HORARIO', 'PROGRAMADO_DATETIME'
+    ]].sort_values('HORARIO', kind='stable')
+
+    # Nearest free planned slot of the same operator, flight number and movement type
+    matched = _match_nearest_slots(
+        movements, slots, ['AERONAVE_OPERADOR', 'VOO_NUMERO', 'MOVIMENTO_TIPO'], tolerance
+    )
+
+    status = pd.Series(RECONCILIATION_UNSCHEDULED, index=movements.index)
+    status[matched.index] = RECONCILIATION_MATCHED
+    wrong_aircraft = matched.index[
+        matched['AERONAVE_TIPO_PROGRAMADO'].notna() &
+        (matched['AERONAVE_TIPO'] != matched['AERONAVE_TIPO_PROGRAMADO'])
+    ]
+    status[wrong_aircraft] = RECONCILIATION_WRONG_AIRCRAFT
+
+    # Same flight number and movement type planned for another operator
+    unmatched = movements.drop(index=matched.index)
+    free_slots = slots[~slots['SLOT_ID'].isin(matched['SLOT_ID'])]
+    other_operator = _match_nearest_slots(
+        unmatched, free_slots.drop(columns=['AERONAVE_TIPO']), ['VOO_NUMERO', 'MOVIMENTO_TIPO'], tolerance
+    )
+    status[other_operator.index] = RECONCILIATION_WRONG_OPERATOR
+
+    df.loc[status.index, 'RECONCILIACAO_STATUS'] = status
+    df.loc[matched.index, 'HORARIO_PROGRAMADO'] = matched['PROGRAMADO_DATETIME']
+    df.loc[other_operator.index, 'HORARIO_PROGRAMADO'] = other_operator['PROGRAMADO_DATETIME']
+    df['RECONCILIACAO_DIVERGENTE'] = df['RECONCILIACAO_STATUS'].isin([
+        RECONCILIATION_UNSCHEDULED, RECONCILIATION_WRONG_OPERATOR, RECONCILIATION_WRONG_AIRCRAFT
+    ])
+
+    # Planned slots inside the RIMA period claimed by no movement, of any operator
+    consumed = slots['SLOT_ID'].isin(matched['SLOT_ID']) | slots['SLOT_ID'].isin(other_operator['SLOT_ID'])
+    in_period = slots['PROGRAMADO_DATETIME'].between(
+        calco.dt.normalize().min(), calco.dt.normalize().max() + pd.Timedelta(days=1), inclusive='left'
+    )
+    missing_slots = schedule.loc[
+        slots.index[in_period & ~consumed]
+    ].sort_values('PROGRAMADO_DATETIME')
+
+    return df, missing_slots
+
+
+PIPELINE_WORKERS = 4
+
+
+@st.cache_resource
+def get_pipeline_executor():
+    """Thread pool shared across reruns for the background pipeline stages."""
+    return ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix='validador')
+
+
+@st.cache_resource
+def get_export_executor():
+    """Single worker for exports, so a slow export never holds a pipeline worker."""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix='validador-export')
+
+
+def release_pipeline_stages(file_digest):
+    """
+    Drop the stages of a previously uploaded file from st.session_state, so
+    their results are freed; the ones still queued are cancelled.
+    """
+    if st.session_state.get('pipeline_file') != file_digest:
+        for _, future in st.session_state.get('pipeline_stages', {}).values():
+            future.cancel()
+        st.session_state['pipeline_stages'] = {}
+        st.session_state['pipeline_file'] = file_digest
+
+
+def get_stage_future(executor, name, params, func, *args):
+    """
+    Return the future of a background stage, submitting it only when its
+    params changed. Futures live in st.session_state, so reruns triggered by
+    widgets reuse finished (or still running) stages; a replaced stage that
+    is still queued is cancelled.
+    """
+    stages = st.session_state.setdefault('pipeline_stages', {})
+    if name in stages:
+        previous_params, previous_future = stages[name]
+        if previous_params == params:
+            return previous_future
+        previous_future.cancel()
+    future = executor.submit(func, *args)
+    stages[name] = (params, future)
+    return future
+
+
+def build_export(df, fmt):
+    """Background stage: export file contents for the download button."""
+    return export_validation_data(df, io.BytesIO(), fmt).getvalue()
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_rima_file(file_digest, _file_bytes):
+    """Cached read of the RIMA CSV with passenger counts validated."""
+    df = pd.read_csv(io.BytesIO(_file_bytes), sep=';', encoding='utf-8')
+    return validate_passenger_count(df)
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def prepare_flight_data(file_digest, _df):
+    """
+    Cached process_flight_data for one uploaded file. Returns the converted
+    CALCO_DATA column and the aggregates; warnings are replayed on reruns.
+    """
+    df = _df.copy()
+    operations_by_date, passengers_by_date, occupancy_by_aircraft = process_flight_data(df)
+    return df['CALCO_DATA'], operations_by_date, passengers_by_date, occupancy_by_aircraft
+
+
+def run_movement_validations(df):
+    """Background stage: movement-time validation followed by anomaly detection."""
+    df = validate_movement_times(df)
+    return detect_statistical_anomalies(df)
+
+
 def main():
     st.title('Análise de Operações e Passageiros')
 
     # File upload
     uploaded_file = st.file_uploader("Escolha um arquivo CSV", type="csv")
+    schedule_file = st.file_uploader("Arquivo de programação HOTRAN/SIROS (opcional)", type="csv")
+    tolerance_minutes = st.number_input(
+        "Tolerância de horário para a reconciliação (min)",
+        min_value=0,
+        value=int(SCHEDULE_TIME_TOLERANCE.total_seconds() // 60),
+        step=5
+    )
 
     if uploaded_file is not None:
-        # Read CSV with specific encoding and separator
-        df = pd.read_csv(uploaded_file, sep=';', encoding='utf-8')
+        progress = st.progress(0.0, text="Lendo arquivo...")
+        executor = get_pipeline_executor()
+
+        # Stage results are keyed on the uploaded files, so widget reruns reuse them
+        file_bytes = uploaded_file.getvalue()
+        file_digest = hashlib.sha1(file_bytes).hexdigest()
+        release_pipeline_stages(file_digest)
+        schedule_digest = None
+        schedule_future = None
+        if schedule_file is not None:
+            schedule_bytes = schedule_file.getvalue()
+            schedule_digest = hashlib.sha1(schedule_bytes).hexdigest()
+            schedule_future = get_stage_future(
+                executor, 'schedule', (schedule_digest,), load_schedule, io.BytesIO(schedule_bytes)
+            )
 
-        # Validate passenger counts
-        df = validate_passenger_count(df)
+        # Read CSV and validate passenger counts
+        base_df = load_rima_file(file_digest, file_bytes)
 
-        # Validate movement times
-        df = validate_movement_times(df)
+        # Validate movement times and detect statistical outliers in the background.
+        # The stage reads the base frame, whose CALCO_DATA is never converted in place.
+        validation_future = get_stage_future(
+            executor, 'validation', (file_digest,), run_movement_validations, base_df
+        )
 
         # Process the data
-        operations_by_date, passengers_by_date, occupancy_by_aircraft = process_flight_data(df)
+        progress.progress(0.2, text="Processando operações e passageiros...")
+        calco_data, operations_by_date, passengers_by_date, occupancy_by_aircraft = \
+            prepare_flight_data(file_digest, base_df)
+        df = base_df.copy()
+        df['CALCO_DATA'] = calco_data
 
         # Create GERAL validation chart
         geral_validation_fig, invalid_geral_flights = create_geral_validation_chart(df)
 
         # Create tabs for different visualizations
-        tab1, tab2, tab3, tab4 = st.tabs([
+        tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
             "Operações & Passageiros", 
             "Análise de Ocupação", 
             "Validação Aviação Geral",
             "Detalhes das Violações",
+            "Horários de Pico",
+            "Reconciliação com Programação",
         ])
 
+        # Filled as soon as the passenger validation is ready
+        stats_container = st.container()
+
         with tab1:
             # Add summary metrics for operations
             col1, col2 = st.columns(2)
@@ -582,6 +1408,83 @@ def main():
                     hide_index=True
                 )
 
+        with stats_container:
+            # Update the metrics to include RPE em Branco
+            st.subheader('Estatísticas Gerais')
+            col1, col2, col3, col4, col5 = st.columns(5)
+
+            with col1:
+                st.metric(
+                    "Total de Operações", 
+                    len(df),
+                    delta=None,
+                )
+
+            with col2:
+                st.metric(
+                    "Total de Passageiros", 
+                    int(df['TOTAL_PAX'].sum()),
+                    delta=None,
+                )
+
+            with col3:
+                capacity_violations = df['EXCEEDS_CAPACITY'].sum()
+                st.metric(
+                    "Violações de Capacidade",
+                    int(capacity_violations),
+                    delta=None,
+                    delta_color="inverse"
+                )
+
+            with col4:
+                geral_violations = df['GERAL_PAX_VIOLATION'].sum()
+                st.metric(
+                    "Violações PAX Aviação Geral",
+                    int(geral_violations),
+                    delta=None,
+                    delta_color="inverse"
+                )
+
+            with col5:
+                rpe_branco_violations = df['RPE_BRANCO_VIOLATION'].sum()
+                st.metric(
+                    "RPE em Branco",
+                    int(rpe_branco_violations),
+                    delta=None,
+                    delta_color="inverse"
+                )
+
+        # Stages that depend on the movement-time validation
+        progress.progress(0.4, text="Validando horários de movimento...")
+        with tab4:
+            with st.spinner("Validando horários de movimento..."):
+                validated_df = validation_future.result().copy()
+        validated_df['CALCO_DATA'] = calco_data
+        df = validated_df
+
+        peak_futures = {
+            source: get_stage_future(
+                executor, f'peaks:{source}', (file_digest,), compute_peak_hours, df, column
+            )
+            for source, column in PEAK_SOURCES.items()
+        }
+
+        # Reconciliation against the planned schedule, when one was uploaded
+        reconciliation_future = None
+        reconciliation_failed = False
+        missing_slots = None
+        if schedule_future is not None:
+            try:
+                schedule = schedule_future.result()
+                reconciliation_future = get_stage_future(
+                    executor, 'reconciliation', (file_digest, schedule_digest, tolerance_minutes),
+                    reconcile_with_schedule, df, schedule, pd.Timedelta(minutes=tolerance_minutes)
+                )
+            except Exception as e:
+                st.error(f"Erro ao carregar o arquivo de programação: {str(e)}")
+                reconciliation_failed = True
+
+        progress.progress(0.6, text="Montando detalhes das violações...")
         with tab4:
             st.subheader('Detalhes das Violações')
 
@@ -675,54 +1578,168 @@ def main():
             )  
             else:
                 st.info("Não foram encontradas violações de aviação geral.")
-            
 
-        # Update the metrics to include RPE em Branco
-        st.subheader('Estatísticas Gerais')
-        col1, col2, col3, col4, col5 = st.columns(5)
-
-        with col1:
-            st.metric(
-                "Total de Operações", 
-                len(df),
-                delta=None,
-            )
+            # Statistical anomalies
+            st.write("### Anomalias Estatísticas")
+            if not has_route_columns(df):
+                st.info(
+                    "O arquivo não possui as colunas " + ", ".join(ROUTE_COLUMNS) +
+                    "; as anomalias foram avaliadas apenas pelo histórico do voo."
+                )
+            anomalies = df[df['ANOMALIA_ESTATISTICA']].copy()
+            if not anomalies.empty:
+                st.write("#### Desvios em Relação ao Histórico do Voo e da Rota")
+                anomalies['CALCO_DATA'] = anomalies['CALCO_DATA'].dt.strftime('%d/%m/%Y')
+                st.dataframe(
+                    anomalies[[
+                        'CALCO_DATA', 'VOO_NUMERO',
+                        'AERONAVE_OPERADOR', 'AERONAVE_MARCAS', 'AERONAVE_TIPO',
+                        'TOTAL_PAX', 'OCCUPANCY_RATE', 'CARGA', 'CORREIO',
+                        'ANOMALIA_SCORE', 'ANOMALIA_DETALHE'
+                    ]].sort_values(['ANOMALIA_SCORE', 'CALCO_DATA'], ascending=[False, True]),
+                    hide_index=True
+                )
+            else:
+                st.info("Não foram encontradas anomalias estatísticas.")
+            
 
-        with col2:
-            st.metric(
-                "Total de Passageiros", 
-                int(df['TOTAL_PAX'].sum()),
-                delta=None,
-            )
+        if reconciliation_future is not None:
+            progress.progress(0.7, text="Reconciliando com a programação...")
+            with tab6:
+                with st.spinner("Reconciliando com a programação..."):
+                    try:
+                        df, missing_slots = reconciliation_future.result()
+                    except Exception as e:
+                        st.error(f"Erro na reconciliação com a programação: {str(e)}")
+                        reconciliation_failed = True
+        report_future = get_stage_future(
+            executor, 'report', (file_digest, schedule_digest, tolerance_minutes),
+            generate_validation_report, df, missing_slots
+        )
 
-        with col3:
-            capacity_violations = df['EXCEEDS_CAPACITY'].sum()
-            st.metric(
-                "Violações de Capacidade",
-                int(capacity_violations),
-                delta=None,
-                delta_color="inverse"
-            )
+        progress.progress(0.8, text="Calculando horários de pico...")
+        with tab5:
+            st.subheader('Horários de Pico')
 
-        with col4:
-            geral_violations = df['GERAL_PAX_VIOLATION'].sum()
-            st.metric(
-                "Violações PAX Aviação Geral",
-                int(geral_violations),
-                delta=None,
-                delta_color="inverse"
-            )
+            peak_source = st.radio("Base de horário", list(PEAK_SOURCES), horizontal=True)
+            with st.spinner("Calculando horários de pico..."):
+                # Copies, since the formatting below must not alter the reused stage result
+                hourly_movements, rolling_peaks, daily_peaks = (
+                    frame.copy() for frame in peak_futures[peak_source].result()
+                )
 
-        with col5:
-            rpe_branco_violations = df['RPE_BRANCO_VIOLATION'].sum()
-            st.metric(
-                "RPE em Branco",
-                int(rpe_branco_violations),
-                delta=None,
-                delta_color="inverse"
-            )
+            if not hourly_movements.empty:
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.metric(
+                        "Pico em Hora-Relógio",
+                        int(daily_peaks['MOVIMENTOS_HORA'].max()),
+                        delta=None
+                    )
+                with col2:
+                    st.metric(
+                        "Pico em Janela Móvel de 60 min",
+                        int(rolling_peaks['MOVIMENTOS_60MIN'].max()),
+                        delta=None
+                    )
+
+                st.plotly_chart(create_peak_hour_chart(hourly_movements), use_container_width=True)
+                st.plotly_chart(create_daily_peak_chart(daily_peaks), use_container_width=True)
+
+                # Busiest rolling window per segment
+                st.write("### Maior Janela Móvel de 60 min por Segmento")
+                rolling_peaks['INICIO_JANELA'] = rolling_peaks['INICIO_JANELA'].dt.strftime('%d/%m/%Y %H:%M')
+                rolling_peaks.columns = ['Segmento', 'Início da Janela', 'Movimentos']
+                st.dataframe(rolling_peaks, hide_index=True)
+
+                # Busiest hour per day
+                st.write("### Hora-Pico por Dia")
+                daily_peaks['DATA'] = daily_peaks['DATA'].dt.strftime('%d/%m/%Y')
+                daily_peaks['HORA'] = daily_peaks['HORA'].dt.strftime('%H:%M')
+                daily_peaks['INICIO_JANELA'] = daily_peaks['INICIO_JANELA'].dt.strftime('%H:%M')
+                daily_peaks.columns = [
+                    'Data', 'Hora-Pico', 'Movimentos na Hora',
+                    'Início da Janela 60 min', 'Movimentos na Janela'
+                ]
+                st.dataframe(daily_peaks, hide_index=True)
+            else:
+                st.info("Não há horários válidos para a análise de pico.")
+
+        with tab6:
+            st.subheader('Reconciliação com a Programação')
+
+            if 'RECONCILIACAO_STATUS' in df.columns:
+                status_counts = df['RECONCILIACAO_STATUS'].value_counts()
+                col1, col2, col3, col4, col5 = st.columns(5)
+                with col1:
+                    st.metric(
+                        "Programados",
+                        int(status_counts.get(RECONCILIATION_MATCHED, 0)),
+                        delta=None
+                    )
+                with col2:
+                    st.metric(
+                        "Não Programados",
+                        int(status_counts.get(RECONCILIATION_UNSCHEDULED, 0)),
+                        delta=None,
+                        delta_color="inverse"
+                    )
+                with col3:
+                    st.metric(
+                        "Operador Divergente",
+                        int(status_counts.get(RECONCILIATION_WRONG_OPERATOR, 0)),
+                        delta=None,
+                        delta_color="inverse"
+                    )
+                with col4:
+                    st.metric(
+                        "Equipamento Divergente",
+                        int(status_counts.get(RECONCILIATION_WRONG_AIRCRAFT, 0)),
+                        delta=None,
+                        delta_color="inverse"
+                    )
+                with col5:
+                    st.metric(
+                        "Programados Não Realizados",
+                        len(missing_slots),
+                        delta=None,
+                        delta_color="inverse"
+                    )
+
+                # RIMA movements without a consistent planned slot
+                st.write("### Movimentos Divergentes da Programação")
+                divergent = df[df['RECONCILIACAO_DIVERGENTE']].copy()
+                if not divergent.empty:
+                    divergent['CALCO_DATA'] = divergent['CALCO_DATA'].dt.strftime('%d/%m/%Y')
+                    divergent['HORARIO_PROGRAMADO'] = divergent['HORARIO_PROGRAMADO'].dt.strftime('%d/%m/%Y %H:%M')
+                    st.dataframe(
+                        divergent[[
+                            'CALCO_DATA', 'CALCO_HORARIO', 'VOO_NUMERO', 'MOVIMENTO_TIPO',
+                            'AERONAVE_OPERADOR', 'AERONAVE_MARCAS', 'AERONAVE_TIPO',
+                            'RECONCILIACAO_STATUS', 'HORARIO_PROGRAMADO'
+                        ]].sort_values(['RECONCILIACAO_STATUS', 'CALCO_DATA']),
+                        hide_index=True
+                    )
+                else:
+                    st.info("Todos os movimentos comerciais correspondem à programação.")
+
+                # Planned slots without a matching movement
+                st.write("### Programados Não Realizados")
+                if not missing_slots.empty:
+                    missing_view = missing_slots[[
+                        'PROGRAMADO_DATETIME', 'AERONAVE_OPERADOR', 'VOO_NUMERO', 'MOVIMENTO_TIPO'
+                    ] + (['AERONAVE_TIPO'] if 'AERONAVE_TIPO' in missing_slots.columns else [])].copy()
+                    missing_view['PROGRAMADO_DATETIME'] = missing_view['PROGRAMADO_DATETIME'].dt.strftime('%d/%m/%Y %H:%M')
+                    st.dataframe(missing_view, hide_index=True)
+                else:
+                    st.info("Todos os voos programados no período foram realizados.")
+            elif reconciliation_failed:
+                st.warning("Não foi possível reconciliar os movimentos: verifique o arquivo de programação enviado.")
+            else:
+                st.info("Envie um arquivo de programação (HOTRAN/SIROS) para reconciliar os movimentos.")
 
-        report_text = generate_validation_report(df)
+        progress.progress(0.9, text="Gerando relatório...")
+        report_text = report_future.result()
         st.download_button(
             label="Baixar Relatório de Validações",
             data=report_text,
@@ -730,6 +1747,36 @@ def main():
             mime="text/plain",
         )
 
+        progress.empty()
+
+        # Export of the validated data and of each violation category, built only on request
+        st.subheader('Exportar Dados e Violações')
+        export_format = st.selectbox("Formato de exportação", EXPORT_FORMATS)
+        export_params = (file_digest, schedule_digest, tolerance_minutes, export_format)
+        if st.button("Preparar exportação"):
+            get_stage_future(get_export_executor(), 'export', export_params, build_export, df, export_format)
+
+        export_stage = st.session_state.get('pipeline_stages', {}).get('export')
+        if export_stage is not None and export_stage[0] == export_params:
+            try:
+                with st.spinner("Preparando exportação..."):
+                    export_bytes = export_stage[1].result()
+            except Exception as e:
+                st.error(f"Erro ao preparar a exportação: {str(e)}")
+            else:
+                if export_format == 'xlsx':
+                    export_name = "validacoes.xlsx"
+                    export_mime = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                else:
+                    export_name = f"validacoes_{export_format}.zip"
+                    export_mime = "application/zip"
+                st.download_button(
+                    label="Baixar Dados e Violações",
+                    data=export_bytes,
+                    file_name=export_name,
+                    mime=export_mime,
+                )
+
 if __name__ == "__main__":
     # Set page config
     st.set_page_config(